@@ -1,155 +1,351 @@
-import requests
+import asyncio
+import aiohttp
 import smtplib
 import time
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
-import statistics
-import json
+from email.message import EmailMessage
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import heapq
+import orjson
 import logging
 from logging import Logger
 import argparse
-from typing import Optional
+from typing import Callable, Optional
 
 LOG : Optional[Logger] = None
 
+# Connect/read timeouts for every API request, so a stalled socket can't hang a monitor
+HTTP_TIMEOUT = aiohttp.ClientTimeout(sock_connect=3.05, sock_read=10)
 
-def get_200_day_moving_average(asset_type):
+# Seconds before a stalled SMTP connect or reply gives up on sending an email
+SMTP_TIMEOUT = 30
+
+CACHE_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# API keys and request URLs, resolved once at import rather than on every poll
+ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
+COIN_GECKO_API_KEY = os.getenv('COIN_GECKO_API_KEY')
+
+SP500_QUOTE_URL = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=SPY&apikey={ALPHA_VANTAGE_API_KEY}'
+SP500_HISTORY_URL = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol=SPY&apikey={ALPHA_VANTAGE_API_KEY}'
+SP500_FULL_HISTORY_URL = f'{SP500_HISTORY_URL}&outputsize=full'
+
+BTC_QUOTE_URL = 'https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd'
+BTC_HISTORY_URL = 'https://api.coingecko.com/api/v3/coins/bitcoin/market_chart?vs_currency=usd&days=90'
+BTC_200_DAY_HISTORY_URL = 'https://api.coingecko.com/api/v3/coins/bitcoin/market_chart?vs_currency=usd&days=200'
+BTC_HEADERS = {"x-cg-demo-api-key": COIN_GECKO_API_KEY} if COIN_GECKO_API_KEY else {}
+
+
+class MonitorError(Exception):
+    """Fatal monitoring error that has already been logged and emailed"""
+
+
+@dataclass
+class ThresholdState:
+    """Alert threshold for an asset, persisted to {asset_type}_threshold.json"""
+    threshold_percent: float
+    last_updated: datetime
+
+
+# In-memory threshold state per asset, read from disk once and written through on change
+THRESHOLD_STATES: dict[str, ThresholdState] = {}
+
+# Decoded cache file contents by path, with the mtime they were read at
+LOADED_CACHES: dict[str, tuple[float, object]] = {}
+
+
+def parse_alpha_vantage_quote(data):
+    """Get the latest price from an Alpha Vantage GLOBAL_QUOTE response"""
+    return float(data['Global Quote']['05. price'])
+
+
+def parse_alpha_vantage_history(data):
+    """Get (dates, closing prices) for the last 3 months from an Alpha Vantage TIME_SERIES_DAILY response"""
+    time_series = data['Time Series (Daily)']
+    
+    three_months_ago = (datetime.now() - timedelta(days=90)).date()
+    dates = []
+    prices = []
+    # Entries are newest first, so stop at the first one outside the window
+    for date_str, values in time_series.items():
+        if date.fromisoformat(date_str) <= three_months_ago:
+            break
+        dates.append(date_str)
+        prices.append(float(values['4. close']))
+    return dates, prices
+
+
+def parse_alpha_vantage_200_day_prices(data):
+    """Get the last 200 closing prices from an Alpha Vantage TIME_SERIES_DAILY response"""
+    time_series = data['Time Series (Daily)']
+    return [float(values['4. close']) for values in list(time_series.values())[:200]]
+
+
+def parse_coin_gecko_quote(data):
+    """Get the latest price from a CoinGecko simple/price response"""
+    return data['bitcoin']['usd']
+
+
+def parse_coin_gecko_history(data):
+    """Get (timestamps, prices) from a CoinGecko market_chart response"""
+    return [price[0] for price in data['prices']], [price[1] for price in data['prices']]
+
+
+def parse_coin_gecko_prices(data):
+    """Get the prices from a CoinGecko market_chart response"""
+    return [price[1] for price in data['prices']]
+
+
+@dataclass(frozen=True)
+class AssetSource:
+    """Where and how to fetch prices for one monitored asset"""
+    name: str
+    quote_url: str
+    parse_quote: Callable
+    history_url: str
+    parse_history: Callable
+    moving_average_url: str
+    parse_moving_average_prices: Callable
+    headers: dict
+
+
+ASSETS = {
+    'sp500': AssetSource(name='S&P 500',
+                         quote_url=SP500_QUOTE_URL,
+                         parse_quote=parse_alpha_vantage_quote,
+                         history_url=SP500_HISTORY_URL,
+                         parse_history=parse_alpha_vantage_history,
+                         moving_average_url=SP500_FULL_HISTORY_URL,
+                         parse_moving_average_prices=parse_alpha_vantage_200_day_prices,
+                         headers={}),
+    'bitcoin': AssetSource(name='Bitcoin',
+                           quote_url=BTC_QUOTE_URL,
+                           parse_quote=parse_coin_gecko_quote,
+                           history_url=BTC_HISTORY_URL,
+                           parse_history=parse_coin_gecko_history,
+                           moving_average_url=BTC_200_DAY_HISTORY_URL,
+                           parse_moving_average_prices=parse_coin_gecko_prices,
+                           headers=BTC_HEADERS),
+}
+
+
+async def fetch_json(session, url, headers=None):
+    """Fetch a URL with the shared session and decode the JSON body"""
+    async with session.get(url, headers=headers) as response:
+        response.raise_for_status()
+        return await response.json(loads=orjson.loads)
+
+
+async def fetch_json_if_modified(session, url, headers=None, etag=None, last_modified=None):
+    """Fetch a URL conditionally, returning (data, etag, last_modified), or None if it is not modified"""
+    headers = dict(headers or {})
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            return None
+        response.raise_for_status()
+        data = await response.json(loads=orjson.loads)
+        return data, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+
+def atomic_write_json(path, obj):
+    """Write JSON to a temp file, fsync it and rename it over path, so readers never see a torn file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(obj))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_cache(cache_file):
+    """Load a JSON cache file regardless of age, or None if there is none"""
+    try:
+        with open(cache_file, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def load_fresh_cache(cache_file):
+    """Load a JSON cache file if it is less than 1 day old, otherwise return None"""
+    # One stat call covers both the existence and the age check
+    try:
+        mtime = os.stat(cache_file).st_mtime
+    except FileNotFoundError:
+        return None
+    
+    if time.time() - mtime >= CACHE_MAX_AGE_SECONDS:
+        return None
+    
+    # Only decode the file again if it was rewritten since we last read it
+    loaded = LOADED_CACHES.get(cache_file)
+    if loaded is not None and loaded[0] == mtime:
+        return loaded[1]
+    
+    with open(cache_file, 'rb') as f:
+        cached = orjson.loads(f.read())
+    LOADED_CACHES[cache_file] = (mtime, cached)
+    return cached
+
+
+async def get_200_day_moving_average(session, asset_type):
     """Get 200-day moving average for asset type"""
     cache_file = f'{asset_type}_200day_cache.json'
     
-    # Check if cache exists and is less than 1 day old
-    if os.path.exists(cache_file):
-        cache_age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(cache_file))
-        if cache_age < timedelta(days=1):
-            LOG.info(f"Using cached {asset_type} 200-day MA data")
-            with open(cache_file, 'r') as f:
-                return json.load(f)['moving_average']
+    cached = load_fresh_cache(cache_file)
+    if cached is not None:
+        LOG.info("Using cached %s 200-day MA data", asset_type)
+        return cached['moving_average']
     
-    LOG.info(f"Fetching {asset_type} 200-day historical data")
+    LOG.info("Fetching %s 200-day historical data", asset_type)
     
-    if asset_type == 'sp500':
-        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-        url = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol=SPY&outputsize=full&apikey={api_key}'
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        time_series = data['Time Series (Daily)']
-        
-        prices = [float(values['4. close']) for values in list(time_series.values())[:200]]
+    source = ASSETS[asset_type]
+    previous = load_cache(cache_file) or {}
+    fetched = await fetch_json_if_modified(session, source.moving_average_url, headers=source.headers,
+                                           etag=previous.get('etag'), last_modified=previous.get('last_modified'))
+    if fetched is None:
+        # Not modified since the last fetch, so extend the cached result for another day
+        LOG.info("%s 200-day historical data not modified", asset_type)
+        previous['timestamp'] = datetime.now().isoformat()
+        atomic_write_json(cache_file, previous)
+        return previous['moving_average']
     
-    elif asset_type == 'bitcoin':
-        api_key = os.getenv('COIN_GECKO_API_KEY')
-        headers = {"x-cg-demo-api-key": api_key} if api_key else {}
-        url = 'https://api.coingecko.com/api/v3/coins/bitcoin/market_chart?vs_currency=usd&days=200'
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        prices = [price[1] for price in data['prices']]
+    data, etag, last_modified = fetched
+    prices = source.parse_moving_average_prices(data)
     
-    moving_average = statistics.mean(prices)
+    moving_average = sum(prices) / len(prices)
     
     # Cache the result
-    with open(cache_file, 'w') as f:
-        json.dump({'moving_average': moving_average, 'timestamp': datetime.now().isoformat()}, f)
+    atomic_write_json(cache_file, {'moving_average': moving_average, 'timestamp': datetime.now().isoformat(),
+                                   'etag': etag, 'last_modified': last_modified})
     
-    LOG.info(f"{asset_type} 200-day moving average: {moving_average:.2f}")
+    LOG.info("%s 200-day moving average: %.2f", asset_type, moving_average)
     return moving_average
 
 
-def get_current_price(asset_type):
+async def get_current_price(session, asset_type):
     """Get current price for asset"""
     try:
-        if asset_type == 'sp500':
-            api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-            url = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=SPY&apikey={api_key}'
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            price = float(data['Global Quote']['05. price'])
-        elif asset_type == 'bitcoin':
-            api_key = os.getenv('COIN_GECKO_API_KEY')
-            headers = {"x-cg-demo-api-key": api_key}
-            url = 'https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd'
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            price = data['bitcoin']['usd']
+        source = ASSETS[asset_type]
+        data = await fetch_json(session, source.quote_url, headers=source.headers)
+        price = source.parse_quote(data)
         
-        LOG.info(f"Current {asset_type} price: {price}")
+        LOG.info("Current %s price: %s", asset_type, price)
         return price
     except Exception as e:
-        LOG.error(f"Failed to get current {asset_type} price: {e}")
+        LOG.error("Failed to get current %s price: %s", asset_type, e)
         raise
 
 
-def get_historical_prices(asset_type):
-    """Get 3-month historical data with daily caching"""
+async def get_historical_prices(session, asset_type):
+    """Get 3-month historical data and its smoothed peak with daily caching"""
     cache_file = f'{asset_type}_cache.json'
     
-    # Check if cache exists and is less than 1 day old
-    if os.path.exists(cache_file):
-        cache_age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(cache_file))
-        if cache_age < timedelta(days=1):
-            LOG.info(f"Using cached {asset_type} historical data")
-            with open(cache_file, 'r') as f:
-                return json.load(f)
-    
-    LOG.info(f"Fetching fresh {asset_type} historical data")
-    
-    if asset_type == 'sp500':
-        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-        url = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol=SPY&apikey={api_key}'
-        response = requests.get(url)
-        data = response.json()
-        response.raise_for_status()
-        time_series = data['Time Series (Daily)']
-        
-        three_months_ago = datetime.now() - timedelta(days=90)
-        prices = []
-        for date_str, values in time_series.items():
-            date = datetime.strptime(date_str, '%Y-%m-%d')
-            if date >= three_months_ago:
-                prices.append(float(values['4. close']))
-    
-    elif asset_type == 'bitcoin':
-        api_key = os.getenv('COIN_GECKO_API_KEY')
-        headers = {"x-cg-demo-api-key": api_key}
-        url = 'https://api.coingecko.com/api/v3/coins/bitcoin/market_chart?vs_currency=usd&days=90'
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        prices = [price[1] for price in data['prices']]
+    cached = load_fresh_cache(cache_file)
+    if cached is not None:
+        LOG.info("Using cached %s historical data", asset_type)
+        # Legacy caches hold the bare price list, without the peak
+        if isinstance(cached, list):
+            cached = {'prices': cached, 'peak': get_smoothed_peak(cached)}
+        return cached
+    
+    LOG.info("Fetching fresh %s historical data", asset_type)
+    
+    source = ASSETS[asset_type]
+    previous = load_cache(cache_file)
+    if not isinstance(previous, dict) or 'top_prices' not in previous:
+        # Missing or legacy cache, so fetch unconditionally and rebuild
+        previous = None
     
-    LOG.info(f"Fetched {len(prices)} {asset_type} historical prices")
+    fetched = await fetch_json_if_modified(session, source.history_url, headers=source.headers,
+                                           etag=previous and previous.get('etag'),
+                                           last_modified=previous and previous.get('last_modified'))
+    if fetched is None:
+        # Not modified since the last fetch, so extend the cached data for another day
+        LOG.info("%s historical data not modified", asset_type)
+        previous['timestamp'] = datetime.now().isoformat()
+        atomic_write_json(cache_file, previous)
+        return previous
     
-    # Cache the results
-    with open(cache_file, 'w') as f:
-        json.dump(prices, f)
-    LOG.info(f"{asset_type} historical data cached successfully")
+    data, etag, last_modified = fetched
+    dates, prices = source.parse_history(data)
     
-    return prices
+    LOG.info("Fetched %d %s historical prices", len(prices), asset_type)
+    
+    # Roll the previous top prices forward by the entries that left and joined the window
+    if previous is not None:
+        previous_entries = set(zip(previous['dates'], previous['prices']))
+        entries = set(zip(dates, prices))
+        top_prices = update_top_prices(previous['top_prices'],
+                                       [price for _, price in previous_entries - entries],
+                                       [price for _, price in entries - previous_entries],
+                                       prices)
+    else:
+        top_prices = get_top_prices(prices)
+    
+    # Cache the results along with the peak, so it is only computed once per refresh
+    historical = {'dates': dates, 'prices': prices, 'top_prices': top_prices,
+                  'peak': sum(top_prices) / len(top_prices), 'timestamp': datetime.now().isoformat(),
+                  'etag': etag, 'last_modified': last_modified}
+    atomic_write_json(cache_file, historical)
+    LOG.info("%s historical data cached successfully", asset_type)
+    
+    return historical
 
 
-def get_threshold_state(asset_type):
-    """Get current threshold state from cache"""
-    threshold_file = f'{asset_type}_threshold.json'
-    default_state = {'threshold_percent': 5.0, 'last_updated': datetime.now().isoformat()}
+def get_top_prices(prices, count=10):
+    """Get the highest prices as a min-heap, without sorting the whole list"""
+    top = heapq.nlargest(count, prices)
+    heapq.heapify(top)
+    return top
+
+
+def update_top_prices(top, removed, added, prices, count=10):
+    """Update the top prices min-heap as prices leave and join the window"""
+    # Only rebuild from the full window when a price in the top leaves it
+    if len(top) < count or any(price >= top[0] for price in removed):
+        return get_top_prices(prices, count)
     
-    if not os.path.exists(threshold_file):
-        state = default_state
-    else:
-        with open(threshold_file, 'r') as f:
-            state = json.load(f)
+    for price in added:
+        heapq.heappushpop(top, price)
+    return top
+
+
+def get_smoothed_peak(prices, count=10):
+    """Get the mean of the highest prices, without sorting the whole list"""
+    top = get_top_prices(prices, count)
+    return sum(top) / len(top)
+
+
+def load_threshold_state(asset_type):
+    """Load threshold state from cache, or the default if there is none"""
+    try:
+        with open(f'{asset_type}_threshold.json', 'rb') as f:
+            state = orjson.loads(f.read())
+    except FileNotFoundError:
+        return ThresholdState(threshold_percent=5.0, last_updated=datetime.now())
+    
+    return ThresholdState(threshold_percent=state['threshold_percent'],
+                          last_updated=datetime.fromisoformat(state['last_updated']))
+
+
+def get_threshold_state(asset_type):
+    """Get current threshold state, only touching disk on first use or when it changes"""
+    state = THRESHOLD_STATES.get(asset_type)
+    if state is None:
+        state = THRESHOLD_STATES[asset_type] = load_threshold_state(asset_type)
     
     # Update threshold daily (decrease by 1% until reaching 5%)
-    last_updated = datetime.fromisoformat(state['last_updated'])
-    if datetime.now() - last_updated >= timedelta(days=1):
-        state['threshold_percent'] = max(5.0, state['threshold_percent'] - 1.0)
-        state['last_updated'] = datetime.now().isoformat()
+    if datetime.now() - state.last_updated >= timedelta(days=1):
+        state = ThresholdState(threshold_percent=max(5.0, state.threshold_percent - 1.0), last_updated=datetime.now())
         save_threshold_state(asset_type, state)
-        LOG.info(f"{asset_type} threshold updated to {state['threshold_percent']}%")
+        LOG.info("%s threshold updated to %s%%", asset_type, state.threshold_percent)
     
     return state
 
@@ -174,7 +370,7 @@ def logger_setup(loglevel='INFO'):
 
 def send_email_moving_average(asset_type, current_price, moving_average_price, drop_percent):
     """Send price drop alert email"""
-    asset_name = 'S&P 500' if asset_type == 'sp500' else 'Bitcoin'
+    asset_name = ASSETS[asset_type].name
     subject = f"{asset_name} Alert: {drop_percent:.1f}% Drop from 200DMA"
     body = f"{asset_name} has dropped {drop_percent:.1f}% from 200DMA of {moving_average_price:.2f} to current price {current_price:.2f}"
     send_notification_email(subject, body)
@@ -187,78 +383,82 @@ def send_notification_email(subject, body):
     recipient_email = os.getenv('RECIPIENT_EMAIL')
     
     if not all([sender_email, sender_password, recipient_email]):
-        LOG.warning(f"Email not configured. {subject}: {body}")
+        LOG.warning("Email not configured. %s: %s", subject, body)
         return
     
     try:
-        msg = MIMEMultipart()
+        msg = EmailMessage()
         msg['From'] = sender_email
         msg['To'] = recipient_email
         msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
+        msg.set_content(body)
         
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
+        with smtplib.SMTP('smtp.gmail.com', 587, timeout=SMTP_TIMEOUT) as server:
             server.starttls()
             server.login(sender_email, sender_password)
             server.send_message(msg)
         
-        LOG.info(f"Email sent: {subject}")
+        LOG.info("Email sent: %s", subject)
     except Exception as e:
-        LOG.error(f"Failed to send email: {e}")
+        LOG.error("Failed to send email: %s", e)
 
 
 def save_threshold_state(asset_type, state):
-    """Save threshold state to cache"""
-    with open(f'{asset_type}_threshold.json', 'w') as f:
-        json.dump(state, f)
+    """Save threshold state in memory and write it through to cache"""
+    THRESHOLD_STATES[asset_type] = state
+    atomic_write_json(f'{asset_type}_threshold.json',
+                      {'threshold_percent': state.threshold_percent, 'last_updated': state.last_updated.isoformat()})
 
 
-import threading
-stop_event = threading.Event()
-
-def monitor_asset(asset_type, check_interval=3600):
-    """Monitor asset for drop from 3-month smoothed peak with dynamic threshold"""
-    asset_name = 'S&P 500' if asset_type == 'sp500' else 'Bitcoin'
-    LOG.info(f"Starting {asset_name} monitoring with dynamic threshold")
+async def check_asset(session, asset_type):
+    """Check asset once for drop from 200-day moving average with dynamic threshold"""
+    asset_name = ASSETS[asset_type].name
     
     try:
-        while not stop_event.is_set():
-            # Get current threshold state
-            threshold_state = get_threshold_state(asset_type)
-            threshold_percent = threshold_state['threshold_percent']
-            
-            # Get 200 day moving average
-            moving_average = get_200_day_moving_average(asset_type)
-            # historical_prices = get_historical_prices(asset_type)
-            # smoothed_peak = statistics.mean(sorted(historical_prices, reverse=True)[:10])
-            
-            # Get current price
-            current_price = get_current_price(asset_type)
-            current_drop_percent = ((moving_average - current_price) / moving_average) * 100
-            
-            LOG.info(f"{asset_name} - Current: {current_price:.2f}, 200DMA: {moving_average:.2f}, Drop: {current_drop_percent:.1f}%, Threshold: {threshold_percent:.1f}%")
-            
-            if current_drop_percent >= threshold_percent:
-                LOG.warning(f"{asset_name} alert triggered! Price dropped {current_drop_percent:.1f}% (threshold: {threshold_percent:.1f}%)"
-                            f" vs 200DMA: {moving_average}")
-                send_email_moving_average(asset_type, current_price, moving_average, current_drop_percent)
-                
-                # Update threshold to require 1% further drop for next alert
-                new_threshold = current_drop_percent + 1.0
-                state = {'threshold_percent': new_threshold, 'last_updated': datetime.now().isoformat()}
-                save_threshold_state(asset_type, state)
-                LOG.info(f"{asset_name} new drop threshold saved: {new_threshold:.1f}%")
+        # Get current threshold state
+        threshold_state = get_threshold_state(asset_type)
+        threshold_percent = threshold_state.threshold_percent
+        
+        # Get 200 day moving average and current price, overlapping the two requests
+        moving_average, current_price = await asyncio.gather(
+            get_200_day_moving_average(session, asset_type),
+            get_current_price(session, asset_type),
+        )
+        # historical = await get_historical_prices(session, asset_type)
+        # smoothed_peak = historical['peak']
+        
+        current_drop_percent = ((moving_average - current_price) / moving_average) * 100
+        
+        LOG.info("%s - Current: %.2f, 200DMA: %.2f, Drop: %.1f%%, Threshold: %.1f%%",
+                 asset_name, current_price, moving_average, current_drop_percent, threshold_percent)
+        
+        if current_drop_percent >= threshold_percent:
+            LOG.warning("%s alert triggered! Price dropped %.1f%% (threshold: %.1f%%) vs 200DMA: %s",
+                        asset_name, current_drop_percent, threshold_percent, moving_average)
+            # SMTP is blocking, so send from a worker thread to keep the other monitors running
+            await asyncio.to_thread(send_email_moving_average, asset_type, current_price, moving_average, current_drop_percent)
             
-            # Sleep in 5-second intervals to check stop_event regularly
-            for _ in range(0, check_interval, 5):
-                if stop_event.wait(5):
-                    break
+            # Update threshold to require 1% further drop for next alert
+            new_threshold = current_drop_percent + 1.0
+            save_threshold_state(asset_type, ThresholdState(threshold_percent=new_threshold, last_updated=datetime.now()))
+            LOG.info("%s new drop threshold saved: %.1f%%", asset_name, new_threshold)
     
     except Exception as e:
-        LOG.error(f"{asset_name} monitoring fatal error: {e}")
-        send_notification_email(f"StockAlert Error - {asset_name}", f"Fatal error in {asset_name} monitoring: {str(e)}")
-        stop_event.set()  # Signal other threads to stop
-        raise
+        LOG.error("%s monitoring fatal error: %s", asset_name, e)
+        await asyncio.to_thread(send_notification_email, f"StockAlert Error - {asset_name}", f"Fatal error in {asset_name} monitoring: {str(e)}")
+        raise MonitorError(f"{asset_name} monitoring failed") from e
+
+
+async def run_monitors(asset_types=tuple(ASSETS), check_interval=3600):
+    """Check all assets together each interval, on one thread and one shared HTTP session"""
+    LOG.info("Starting monitoring of %s with dynamic threshold", ', '.join(asset_types))
+    
+    connector = aiohttp.TCPConnector(limit=8, limit_per_host=4, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT) as session:
+        while True:
+            # A fatal error in any asset propagates here and stops monitoring
+            await asyncio.gather(*(check_asset(session, asset_type) for asset_type in asset_types))
+            await asyncio.sleep(check_interval)
 
 
 def main():
@@ -266,26 +466,22 @@ def main():
     # setup logging
     logger_setup()
     
+    if not ALPHA_VANTAGE_API_KEY:
+        LOG.warning("ALPHA_VANTAGE_API_KEY is not set, S&P 500 requests will fail")
+    
     # Send startup notification
     send_notification_email("StockAlert Started", f"StockAlert monitoring started successfully at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # Start monitoring both assets in separate threads
-    sp500_thread = threading.Thread(target=monitor_asset, args=('sp500',))
-    bitcoin_thread = threading.Thread(target=monitor_asset, args=('bitcoin',))
-    
-    sp500_thread.start()
-    bitcoin_thread.start()
-    
     try:
-        sp500_thread.join()
-        bitcoin_thread.join()
+        asyncio.run(run_monitors())
     except KeyboardInterrupt:
         LOG.info("Shutdown requested")
-        stop_event.set()
+    except MonitorError as e:
+        # Already reported by the failing monitor, so don't email again
+        LOG.info("Stopped: %s", e)
     except Exception as e:
-        LOG.error(f"Main thread error: {e}")
+        LOG.error("Main thread error: %s", e)
         send_notification_email("StockAlert Fatal Error", f"Application encountered fatal error: {str(e)}")
-        stop_event.set()
 
 
 if __name__ == "__main__":
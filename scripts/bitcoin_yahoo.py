@@ -2,44 +2,77 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from datetime import date
+from pathlib import Path
 
 # -----------------------------
 # Parameters
 # -----------------------------
 symbol = "BTC-USD"
 start_date = "2015-01-01"  # BTC data before 2015 is less liquid
+cache_dir = Path("cache")              # parquet copies of the downloads
 dip_thresholds = [-0.20, -0.30, -0.40, -0.50]  # -30%, -40%, -50%
 forward_windows = [30, 90, 180, 365]   # 1m, 3m, 6m, 12m (calendar days)
 
 # -----------------------------
 # Helper Functions
 # -----------------------------
-def compute_rsi(series, window=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+def compute_rsi(prices, window=14):
+    delta = np.diff(prices, prepend=prices[0])
+    gain = np.maximum(delta, 0.0)
+    loss = np.maximum(-delta, 0.0)
+    # Rolling means from differences of a zero-padded cumulative sum
+    c_gain = np.concatenate(([0.0], np.cumsum(gain)))
+    c_loss = np.concatenate(([0.0], np.cumsum(loss)))
+    avg_gain = (c_gain[window:] - c_gain[:-window]) / window
+    avg_loss = (c_loss[window:] - c_loss[:-window]) / window
+    rsi = np.full(len(prices), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi[window - 1:] = 100 - (100 / (1 + avg_gain / avg_loss))
+    return rsi
 
 def compute_drawdowns(prices):
-    rolling_max = prices.cummax()
+    rolling_max = np.maximum.accumulate(prices)
     drawdown = (prices - rolling_max) / rolling_max
     return drawdown
 
+def download(sym, start):
+    df = yf.download(sym, start=start, auto_adjust=False)
+    # Single ticker, so drop the ticker level and make each column a plain Series
+    df.columns = df.columns.get_level_values(0)
+    return df
+
+def load_history(sym):
+    path = cache_dir / f"{sym}.parquet"
+    if not path.exists():
+        df = download(sym, start_date)
+    else:
+        df = pd.read_parquet(path)
+        if date.fromtimestamp(path.stat().st_mtime) == date.today():
+            return df
+        # Only download from the last cached day onwards, re-fetching that
+        # day in case it was cached before the close
+        df = pd.concat([df, download(sym, df.index.max())])
+        df = df[~df.index.duplicated(keep="last")]
+    cache_dir.mkdir(exist_ok=True)
+    df.to_parquet(path, compression="zstd")
+    return df
+
 # -----------------------------
 # Get Data
 # -----------------------------
-data = yf.download(symbol, start=start_date, auto_adjust=False)
+data = load_history(symbol)
 data["Close"] = data["Adj Close"]
 
 # -----------------------------
 # Indicators
 # -----------------------------
-close = data["Close"][symbol]
-data["Drawdown"] = compute_drawdowns(close)
+close = data["Close"]
+close_arr = close.to_numpy(dtype=np.float64)
+data["Drawdown"] = compute_drawdowns(close_arr)
 data["200DMA"] = close.rolling(200).mean()
 data["200DMA_deviation"] = (close - data["200DMA"]) / data["200DMA"]
-data["RSI"] = compute_rsi(close)
+data["RSI"] = compute_rsi(close_arr)
 
 # -----------------------------
 # Buy Signals
@@ -49,7 +82,7 @@ for t in dip_thresholds:
     signals[f"Dip_{int(t*100)}"] = (
         (data["Drawdown"] <= t) &
         (data["RSI"] < 30) &
-        (data["Close"][symbol] < data["200DMA"])
+        (data["Close"] < data["200DMA"])
     )
 
 # -----------------------------
@@ -57,20 +90,22 @@ for t in dip_thresholds:
 # -----------------------------
 results = []
 for t in dip_thresholds:
-    signal_dates = signals.index[signals[f"Dip_{int(t*100)}"]]
-    for date in signal_dates:
-        entry_price = data.loc[date, "Close"][symbol]
-        row = {"Threshold": f"{int(t*100)}%", "Date": date, "Entry Price": entry_price}
-        for fw in forward_windows:
-            future_date = date + pd.Timedelta(days=fw)
-            if future_date in data.index:
-                future_price = data.loc[future_date, "Close"][symbol]
-                row[f"Return_{fw}d"] = (future_price / entry_price - 1) * 100
-            else:
-                row[f"Return_{fw}d"] = np.nan
-        results.append(row)
+    sig_pos = np.flatnonzero(signals[f"Dip_{int(t*100)}"].to_numpy())
+    sig_dates = data.index[sig_pos]
+    entry_prices = close_arr[sig_pos]
+    columns = {"Threshold": f"{int(t*100)}%", "Date": sig_dates, "Entry Price": entry_prices}
+    for fw in forward_windows:
+        future_dates = sig_dates + pd.Timedelta(days=fw)
+        future_pos = data.index.searchsorted(future_dates)
+        # Only an exact calendar-day match has a price; gaps and the future stay NaN
+        found = future_pos < len(close_arr)
+        found[found] = data.index[future_pos[found]] == future_dates[found]
+        returns = np.full(len(sig_pos), np.nan)
+        returns[found] = (close_arr[future_pos[found]] / entry_prices[found] - 1) * 100
+        columns[f"Return_{fw}d"] = returns
+    results.append(pd.DataFrame(columns))
 
-results_df = pd.DataFrame(results)
+results_df = pd.concat(results, ignore_index=True)
 pd.set_option("display.max_rows", 20)
 print("\n=== Bitcoin Buy-the-Dip Signal Performance ===\n")
 print(results_df)
@@ -90,8 +125,8 @@ plt.plot(data.index, data["Close"], label="Bitcoin", color="black")
 
 colors = {-0.2: "green", -0.30: "orange", -0.40: "red", -0.50: "purple"}
 for t in dip_thresholds:
-    signal_dates = signals.index[signals[f"Dip_{int(t*100)}"]]
-    plt.scatter(signal_dates, data.loc[signal_dates, "Close"], 
+    sig_pos = np.flatnonzero(signals[f"Dip_{int(t*100)}"].to_numpy())
+    plt.scatter(data.index[sig_pos], close_arr[sig_pos], 
                 label=f"{int(t*100)}% Dip Signal", marker="^", s=100, 
                 color=colors[t])
 
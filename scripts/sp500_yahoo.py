@@ -1,113 +1,224 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import argparse
+import sys
+import warnings
+from numba import njit, prange
+from datetime import date
+from pathlib import Path
 
 # -----------------------------
 # Parameters
 # -----------------------------
+parser = argparse.ArgumentParser(description="Backtest buy-the-dip signals on the S&P 500")
+parser.add_argument("--plot", action="store_true", help="show the signals chart in a window")
+parser.add_argument("--save-plot", metavar="PATH", help="save the signals chart to an image file")
+args = parser.parse_args()
+
 symbol = "^GSPC"        # S&P 500 index
 vix_symbol = "^VIX"     # Volatility Index
 start_date = "2000-01-01"
 dip_thresholds = [-0.10, -0.15, -0.20]  # -10%, -15%, -20%
 forward_windows = [21, 63, 126, 252]   # ~1m, 3m, 6m, 12m (trading days)
+cache_dir = Path("cache")              # parquet copies of the downloads
+results_path = "sp500_results.csv"     # full per-signal results table
 
 # -----------------------------
 # Helper Functions
 # -----------------------------
-def compute_rsi(series, window=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+@njit(cache=True)
+def compute_indicators(prices, sma_window=200, rsi_window=14):
+    # Drawdown, simple moving average and Wilder RSI in a single pass, so
+    # the price array is only streamed through once
+    # Outputs take the input dtype, while the running sums and averages stay
+    # float64 scalars so float32 input doesn't accumulate rounding error
+    n = len(prices)
+    drawdown = np.empty(n, dtype=prices.dtype)
+    sma = np.full(n, np.nan, dtype=prices.dtype)
+    rsi = np.full(n, np.nan, dtype=prices.dtype)
+    peak = -np.inf
+    window_sum = 0.0
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(n):
+        price = prices[i]
+
+        # Drawdown from the running peak
+        if price > peak:
+            peak = price
+        drawdown[i] = price / peak - 1.0
+
+        # Simple moving average from a running window sum
+        window_sum += price
+        if i >= sma_window:
+            window_sum -= prices[i - sma_window]
+        if i >= sma_window - 1:
+            sma[i] = window_sum / sma_window
+
+        # RSI: seed with the simple mean of the first `rsi_window` changes,
+        # then apply Wilder's smoothing (an EMA with alpha = 1/rsi_window).
+        # This is smoother than a 14-day simple-mean RSI and dips below 30 on
+        # far fewer days, so it selects different (and fewer) signal days
+        if i == 0:
+            continue
+        delta = price - prices[i - 1]
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if i <= rsi_window:
+            avg_gain += gain / rsi_window
+            avg_loss += loss / rsi_window
+            if i < rsi_window:
+                continue
+        else:
+            avg_gain = (avg_gain * (rsi_window - 1) + gain) / rsi_window
+            avg_loss = (avg_loss * (rsi_window - 1) + loss) / rsi_window
+        if avg_loss > 0:
+            rsi[i] = 100 - (100 / (1 + avg_gain / avg_loss))
+        elif avg_gain > 0:
+            rsi[i] = 100.0
+    return drawdown, sma, rsi
+
+@njit(parallel=True, cache=True)
+def forward_returns(prices, sig_pos, offsets):
+    # Percent return from each signal to each forward offset, NaN past the
+    # end of the data. Signals are independent, so they run in parallel
+    out = np.full((len(sig_pos), len(offsets)), np.nan, dtype=prices.dtype)
+    for k in prange(len(sig_pos)):
+        i = sig_pos[k]
+        entry = prices[i]
+        for j in range(len(offsets)):
+            fi = i + offsets[j]
+            if fi < len(prices):
+                out[k, j] = (prices[fi] / entry - 1) * 100
+    return out
+
+def download(sym, start):
+    df = yf.download(sym, start=start, auto_adjust=False)
+    # Single ticker, so drop the ticker level and make each column a plain Series
+    df.columns = df.columns.get_level_values(0)
+    return df
 
-def compute_drawdowns(prices):
-    rolling_max = prices.cummax()
-    drawdown = (prices - rolling_max) / rolling_max
-    return drawdown
+def load_history(sym):
+    path = cache_dir / f"{sym.lstrip('^')}.parquet"
+    if not path.exists():
+        df = download(sym, start_date)
+    else:
+        df = pd.read_parquet(path)
+        if date.fromtimestamp(path.stat().st_mtime) == date.today():
+            return df
+        # Only download from the last cached day onwards, re-fetching that
+        # day in case it was cached before the close
+        df = pd.concat([df, download(sym, df.index.max())])
+        df = df[~df.index.duplicated(keep="last")]
+    cache_dir.mkdir(exist_ok=True)
+    df.to_parquet(path, compression="zstd")
+    return df
 
 # -----------------------------
 # Get Data
 # -----------------------------
-data = yf.download(symbol, start=start_date, auto_adjust=False)
+data = load_history(symbol)
 data["Close"] = data["Adj Close"]
 
 # Pull VIX data
-vix = yf.download(vix_symbol, start=start_date, auto_adjust=False)
-vix["VIX"] = vix["Adj Close"]
+vix = load_history(vix_symbol)
 
-# Merge with S&P
-data = data.join(vix, how="left")
+# Only the VIX close is needed, aligned to the S&P 500 trading days
+data["VIX"] = vix["Adj Close"].reindex(data.index).to_numpy(dtype=np.float32)
 
 # -----------------------------
 # Indicators
 # -----------------------------
-# Ensure we only use the Close column as a Series
-close = data["Close"]['^GSPC']
+# Ensure we only use the Close column as a Series. The analytics only need
+# display precision, so run them in float32 to halve the memory traffic
+close = data["Close"]
+close_arr = close.to_numpy(dtype=np.float32)
 
-data["Drawdown"] = compute_drawdowns(close)
-data["200DMA"] = close.rolling(200).mean()
+data["Drawdown"], data["200DMA"], data["RSI"] = compute_indicators(close_arr)
 data["200DMA_deviation"] = (close - data["200DMA"]) / data["200DMA"]
-data["RSI"] = compute_rsi(close)
 
 # -----------------------------
 # Buy Signals
 # -----------------------------
-signals = pd.DataFrame(index=data.index)
-for t in dip_thresholds:
-    signals[f"Dip_{int(t*100)}"] = (
-        (data["Drawdown"] <= t) & 
-            (data["RSI"] < 30) & 
-            (data["VIX"] > 25)   # Add VIX filter
-    )
+# RSI and VIX filters are shared by every threshold, so build them once and
+# broadcast the drawdown against all thresholds in one (days, thresholds) op
+oversold = (data["RSI"].to_numpy() < 30) & (data["VIX"].to_numpy() > 25)   # Add VIX filter
+dip = data["Drawdown"].to_numpy()[:, None] <= np.asarray(dip_thresholds)[None, :]
+signals = dip & oversold[:, None]
 
 # -----------------------------
 # Performance Evaluation
 # -----------------------------
-results = []
-for t in dip_thresholds:
-    signal_dates = signals.index[signals[f"Dip_{int(t*100)}"]]
-    for date in signal_dates:
-        entry_price = data.loc[date, "Close"]['^GSPC']
-        row = {"Threshold": f"{int(t*100)}%", "Date": date, "Entry Price": entry_price}
-        for fw in forward_windows:
-            if data.index.get_loc(date) + fw < len(data):
-                future_date = data.index[data.index.get_loc(date) + fw]
-                future_price = data.loc[future_date, "Close"]['^GSPC']
-                row[f"Return_{fw}d"] = (future_price / entry_price - 1) * 100
-            else:
-                row[f"Return_{fw}d"] = np.nan
-        results.append(row)
-
-results_df = pd.DataFrame(results)
-pd.set_option("display.max_rows", 20)
-print("\n=== Buy-the-Dip Signal Performance ===\n")
-print(results_df)
+fw_offsets = np.asarray(forward_windows)
+labels = np.asarray([f"{int(t*100)}%" for t in dip_thresholds])
+
+# Integer signal positions, computed once and reused below: grouped by
+# threshold (index into labels) and ascending within each, so the gathers
+# walk close_arr in order
+thr_code, sig_rows = np.nonzero(signals.T)
+
+# Report results in float64 so the printed and saved tables don't show
+# float32 rounding noise (e.g. 17.950001); entry prices come straight from
+# the float64 close, since widening a float32 price can't restore its digits
+entry_arr = close.to_numpy(dtype=np.float64)[sig_rows]
+ret_mat = forward_returns(close_arr, sig_rows, fw_offsets).astype(np.float64)
+
+results_df = pd.DataFrame({
+    "Threshold": labels[thr_code],
+    "Date": data.index[sig_rows],
+    "Entry Price": entry_arr,
+    **{f"Return_{fw}d": ret_mat[:, j] for j, fw in enumerate(forward_windows)},
+})
+# Only format the preview rows; the full table goes to CSV
+results_df.to_csv(results_path, index=False)
+print(f"\n=== Buy-the-Dip Signal Performance (first 10 of {len(results_df)}, all in {results_path}) ===\n")
+results_df.head(10).to_string(buf=sys.stdout)
+print()
 
 # -----------------------------
 # Average Returns Summary
 # -----------------------------
-summary = results_df.groupby("Threshold")[[c for c in results_df.columns if "Return" in c]].mean()
+# Few thresholds, so average each one's rows of the return matrix directly.
+# Like groupby, thresholds without signals are left out and all-NaN windows
+# give NaN (without nanmean's empty-slice warning)
+present = np.unique(thr_code)
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", RuntimeWarning)
+    means = np.empty((0, len(forward_windows)), dtype=ret_mat.dtype)
+    if present.size:
+        means = np.vstack([np.nanmean(ret_mat[thr_code == k], axis=0) for k in present])
+summary = pd.DataFrame(means, index=pd.Index(labels[present], name="Threshold"),
+                       columns=[f"Return_{fw}d" for fw in forward_windows])
 print("\n=== Average Returns by Threshold ===\n")
 print(summary.round(2))
 
 # -----------------------------
 # Plot
 # -----------------------------
-plt.figure(figsize=(14, 8))
-plt.plot(data.index, data["Close"][symbol], label="S&P 500", color="black")
-
-colors = {-0.10: "orange", -0.15: "red", -0.20: "purple"}
-for t in dip_thresholds:
-    signal_dates = signals.index[signals[f"Dip_{int(t*100)}"]]
-    plt.scatter(signal_dates, data.loc[signal_dates, "Close"][symbol], 
-                label=f"{int(t*100)}% Dip Signal", marker="^", s=100, 
-                color=colors[t])
-
-plt.plot(data.index, data["200DMA"], label="200DMA", linestyle="--", alpha=0.7)
-plt.title("S&P 500 - Buy the Dip Signals (With VIX filter)")
-plt.xlabel("Date")
-plt.ylabel("Price")
-plt.legend()
-plt.show()
+# Skipped unless asked for, and rendered without a GUI when only saving
+if args.plot or args.save_plot:
+    import matplotlib
+    if not args.plot:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(14, 8))
+    plt.plot(data.index, close_arr, label="S&P 500", color="black")
+
+    colors = {-0.10: "orange", -0.15: "red", -0.20: "purple"}
+    for k, t in enumerate(dip_thresholds):
+        sig_pos = sig_rows[thr_code == k]
+        plt.scatter(data.index[sig_pos], close_arr[sig_pos], 
+                    label=f"{int(t*100)}% Dip Signal", marker="^", s=100, 
+                    color=colors[t])
+
+    plt.plot(data.index, data["200DMA"].to_numpy(), label="200DMA", linestyle="--", alpha=0.7)
+    plt.title("S&P 500 - Buy the Dip Signals (With VIX filter)")
+    plt.xlabel("Date")
+    plt.ylabel("Price")
+    plt.legend()
+    if args.save_plot:
+        fig.savefig(args.save_plot)
+    if args.plot:
+        plt.show()